@@ -0,0 +1,220 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import scripts
+
+CACHE_FILE = 'feature_matrix.pkl'
+
+# Bump whenever the way features are computed changes so old caches are rebuilt
+CACHE_VERSION = 3
+
+# Feature -> True if a higher value is better, used to orient scores
+FEATURES = {
+    'win_rate': True,
+    'podium_rate': True,
+    'points_share': True,
+    'qualifying_position': False,
+    'teammate_h2h': True,
+    'dnf_rate': False,
+    'pace_percentile': True,
+}
+
+
+def season_results(db='f1.db'):
+    """
+    Wins, podiums, points share of the team and DNF rate per driver per season in one grouped pass.
+    Only cars that started count (DNQ, DNPQ, withdrawn, etc are left out).
+    DNF is anything that isn't "Finished" or classified laps down ("+1 Lap", etc).
+    :param db: Path of the sqlite DB
+    """
+    sql = "SELECT results.driverId, races.year, COUNT(*) AS races, " \
+          "SUM(results.position = 1) AS wins, " \
+          "SUM(results.position IN (1, 2, 3)) AS podiums, " \
+          "SUM(results.points) AS points, " \
+          "SUM(results.points) / NULLIF(SUM(team.team_points), 0) AS points_share, " \
+          "AVG(status.status <> 'Finished' AND status.status NOT LIKE '+%') AS dnf_rate, " \
+          "AVG(NULLIF(results.grid, 0)) AS grid_position FROM results " \
+          "JOIN races USING(raceId) " \
+          "JOIN status USING(statusId) " \
+          "JOIN (SELECT raceId, constructorId, SUM(points) AS team_points FROM results " \
+          "GROUP BY raceId, constructorId) AS team USING(raceId, constructorId) " \
+          "WHERE results.grid > 0 OR results.laps > 0 " \
+          "GROUP BY results.driverId, races.year"
+
+    return scripts.db_pull(sql, db=db)
+
+
+def season_qualifying(db='f1.db'):
+    """
+    Average qualifying position per driver per season (1994 onwards).
+    :param db: Path of the sqlite DB
+    """
+    sql = "SELECT qualifying.driverId, races.year, AVG(qualifying.position) AS qualifying_position " \
+          "FROM qualifying " \
+          "JOIN races USING(raceId) " \
+          "GROUP BY qualifying.driverId, races.year"
+
+    return scripts.db_pull(sql, db=db)
+
+
+def season_teammate_h2h(db='f1.db'):
+    """
+    Share of races a driver finished ahead of their teammate(s) per season, only counting races both started.
+    :param db: Path of the sqlite DB
+    """
+    sql = "SELECT a.driverId, races.year, " \
+          "AVG(a.positionOrder < b.positionOrder) AS teammate_h2h FROM results AS a " \
+          "JOIN results AS b ON a.raceId = b.raceId AND a.constructorId = b.constructorId " \
+          "AND a.driverId <> b.driverId " \
+          "JOIN races ON a.raceId = races.raceId " \
+          "WHERE (a.grid > 0 OR a.laps > 0) AND (b.grid > 0 OR b.laps > 0) " \
+          "GROUP BY a.driverId, races.year"
+
+    return scripts.db_pull(sql, db=db)
+
+
+def season_pace(db='f1.db'):
+    """
+    Average lap time percentile within each race per driver per season, 1.0 being the fastest.
+    Empty if lap_times hasn't been loaded.
+    :param db: Path of the sqlite DB
+    """
+    sql = "SELECT lap_times.raceId, lap_times.driverId, races.year, " \
+          "AVG(lap_times.milliseconds) AS avg_ms FROM lap_times " \
+          "JOIN races USING(raceId) " \
+          "GROUP BY lap_times.raceId, lap_times.driverId"
+
+    data = scripts.db_pull(sql, db=db)
+    data['pace_percentile'] = data.groupby('raceId')['avg_ms'].rank(pct=True, ascending=False)
+
+    return data.groupby(['driverId', 'year'], as_index=False)['pace_percentile'].mean()
+
+
+def build_feature_matrix(db='f1.db'):
+    """
+    Builds the feature vector of every driver season.
+    :param db: Path of the sqlite DB
+    :return: DataFrame indexed by (driverId, year)
+    """
+    keys = ['driverId', 'year']
+    data = season_results(db)
+    for frame in (season_qualifying(db), season_teammate_h2h(db), season_pace(db)):
+        data = data.merge(frame, on=keys, how='left')
+
+    # Qualifying data only goes back to 1994, fall back on the grid before that
+    data['qualifying_position'] = data['qualifying_position'].fillna(data['grid_position'])
+
+    names = scripts.db_pull("SELECT driverId, forename || ' ' || surname AS full_name FROM drivers", db=db)
+    data = data.merge(names, on='driverId', how='left')
+
+    return data.drop(columns='grid_position').set_index(keys).sort_index()
+
+
+def feature_matrix(refresh=False, db='f1.db'):
+    """
+    Returns the feature matrix from the cache stored next to the DB, rebuilding it if the DB,
+    FEATURES or CACHE_VERSION changed since it was made.
+    :param refresh: Forces a rebuild of the cache (default is False)
+    :param db: Path of the sqlite DB (default is f1.db)
+    :return: DataFrame indexed by (driverId, year)
+    """
+    cache_file = os.path.join(os.path.dirname(os.path.abspath(db)), CACHE_FILE)
+    key = (os.path.getmtime(db), CACHE_VERSION, tuple(FEATURES))
+
+    if not refresh and os.path.exists(cache_file):
+        cache = pd.read_pickle(cache_file)
+        if cache.get('key') == key:
+            return cache['matrix']
+
+    matrix = build_feature_matrix(db)
+    pd.to_pickle({'key': key, 'matrix': matrix}, cache_file)
+
+    return matrix
+
+
+def driver_profiles(min_races=1, refresh=False, db='f1.db'):
+    """
+    Collapses the season matrix into a single career vector per driver, weighting each season by races started.
+    :param min_races: Minimum career starts for a driver to be included (default is 1)
+    :param refresh: Forces a rebuild of the cached feature matrix (default is False)
+    :param db: Path of the sqlite DB (default is f1.db)
+    :return: DataFrame indexed by driverId with full_name, races and every column in FEATURES
+    """
+    matrix = feature_matrix(refresh=refresh, db=db).reset_index()
+
+    rated = ['points_share', 'qualifying_position', 'teammate_h2h', 'dnf_rate', 'pace_percentile']
+    weights = matrix[rated].notna().mul(matrix['races'], axis=0)
+    weighted = matrix[rated].fillna(0).mul(weights)
+    weighted[['races', 'wins', 'podiums']] = matrix[['races', 'wins', 'podiums']]
+    weighted['driverId'] = matrix['driverId']
+    weights['driverId'] = matrix['driverId']
+
+    totals = weighted.groupby('driverId').sum()
+    profiles = totals[rated] / weights.groupby('driverId').sum().replace(0, np.nan)
+    profiles['races'] = totals['races']
+    profiles['win_rate'] = totals['wins'] / totals['races']
+    profiles['podium_rate'] = totals['podiums'] / totals['races']
+
+    profiles['full_name'] = matrix.groupby('driverId')['full_name'].first()
+
+    return profiles.loc[profiles['races'] >= min_races, ['full_name', 'races'] + list(FEATURES)]
+
+
+def standardize(profiles):
+    """
+    Z-scores every feature and flips those where lower is better, missing values sit at the mean.
+    :param profiles: DataFrame from driver_profiles
+    :return: 2D numpy array of shape (drivers, features)
+    """
+    values = profiles[list(FEATURES)].astype(float)
+    z = ((values - values.mean()) / values.std(ddof=0)).fillna(0).to_numpy()
+
+    return z * np.where(list(FEATURES.values()), 1, -1)
+
+
+def rank_drivers(weights=None, min_races=20, top=20, db='f1.db'):
+    """
+    Ranks drivers on a weighted sum of their standardized features.
+    :param weights: Optional dict of feature -> weight (default is every feature weighted equally)
+    :param min_races: Minimum career starts for a driver to be ranked (default is 20)
+    :param top: Number of drivers to return (default is 20)
+    :param db: Path of the sqlite DB (default is f1.db)
+    :return: DataFrame of the top drivers sorted by score
+    """
+    profiles = driver_profiles(min_races=min_races, db=db)
+    weights = {feature: 1 for feature in FEATURES} if weights is None else weights
+    w = np.array([weights.get(feature, 0) for feature in FEATURES], dtype=float)
+
+    profiles['score'] = standardize(profiles) @ w
+
+    return profiles.sort_values('score', ascending=False).head(top)
+
+
+def similar_drivers(driver, n=10, weights=None, min_races=20, db='f1.db'):
+    """
+    Finds the drivers with the closest career profile to the given driver.
+    :param driver: driverId or full name (i.e. 'Lewis Hamilton')
+    :param n: Number of drivers to return (default is 10)
+    :param weights: Optional dict of feature -> weight used to scale the distance (default is equal weights)
+    :param min_races: Minimum career starts for a driver to be compared (default is 20)
+    :param db: Path of the sqlite DB (default is f1.db)
+    :return: DataFrame of the closest drivers sorted by distance
+    """
+    profiles = driver_profiles(min_races=min_races, db=db)
+    weights = {feature: 1 for feature in FEATURES} if weights is None else weights
+    w = np.array([weights.get(feature, 0) for feature in FEATURES], dtype=float)
+
+    if isinstance(driver, str):
+        matches = profiles.index[profiles['full_name'] == driver]
+    else:
+        matches = profiles.index[profiles.index == driver]
+    if len(matches) == 0:
+        raise ValueError(f'{driver} not found or has fewer than {min_races} races.')
+
+    z = standardize(profiles) * np.sqrt(w)
+    target = z[profiles.index.get_loc(matches[0])]
+    profiles['distance'] = np.sqrt(((z - target) ** 2).sum(axis=1))
+
+    return profiles.drop(index=matches[0]).sort_values('distance').head(n)
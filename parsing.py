@@ -0,0 +1,127 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Matches Ergast time strings such as "1:34:50.616", "1:27.452", "26.898" and "+5.478",
+# including the odd older gap formats like "+ 1:06.7", "+1.469s" and "+8.959 sec"
+TIME_PATTERN = r'^\+?\s*(?:(?:(?P<hours>\d+):)?(?P<minutes>\d+):)?(?P<seconds>\d+(?:\.\d+)?)(?:\s*s(?:ec)?)?$'
+
+# Source VARCHAR column -> parsed numeric column, per table
+PARSED_COLUMNS = {
+    'qualifying': {
+        'q1': ('q1_ms', 'INTEGER'),
+        'q2': ('q2_ms', 'INTEGER'),
+        'q3': ('q3_ms', 'INTEGER'),
+    },
+    'results': {
+        'time': ('gap_ms', 'INTEGER'),
+        'fastestLapTime': ('fastestLapTime_ms', 'INTEGER'),
+        'fastestLapSpeed': ('fastestLapSpeed_kph', 'REAL'),
+    },
+    'pit_stops': {
+        'duration': ('duration_ms', 'INTEGER'),
+    },
+}
+
+PARSED_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS qualifying_race_q1 ON qualifying(raceId, q1_ms)',
+    'CREATE INDEX IF NOT EXISTS qualifying_race_q2 ON qualifying(raceId, q2_ms)',
+    'CREATE INDEX IF NOT EXISTS qualifying_race_q3 ON qualifying(raceId, q3_ms)',
+    'CREATE INDEX IF NOT EXISTS results_race_fastest_lap ON results(raceId, fastestLapTime_ms)',
+    'CREATE INDEX IF NOT EXISTS pit_stops_race_duration ON pit_stops(raceId, duration_ms)',
+)
+
+
+def parse_times(values):
+    """
+    Converts an array of time strings into milliseconds in one vectorized pass.
+    Null markers (\\N, empty strings) and anything that isn't a time (i.e. "+1 Lap") become NaN.
+    :param values: Iterable of time strings
+    :return: Float Series of milliseconds, NaN where the value couldn't be parsed
+    """
+    values = pd.Series(values, dtype=object).astype(str).str.strip()
+    parts = values.str.extract(TIME_PATTERN).astype(float)
+
+    ms = (parts['hours'].fillna(0) * 3600
+          + parts['minutes'].fillna(0) * 60
+          + parts['seconds']) * 1000
+
+    return ms.round()
+
+
+def parse_floats(values):
+    """
+    Converts an array of numeric strings (i.e. fastestLapSpeed) into floats.
+    :param values: Iterable of numeric strings
+    :return: Float Series, NaN where the value couldn't be parsed
+    """
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+
+
+def parse_column(table, column, data):
+    """
+    Parses a single source column of a table into its numeric counterpart.
+    :param table: Table name the column belongs to
+    :param column: Source column name
+    :param data: DataFrame holding the source column (and position for results)
+    :return: Series of parsed values
+    """
+    if table == 'results' and column == 'time':
+        # The winner's time is the race duration, everyone else's is a "+x" gap
+        gap = parse_times(data['time'])
+        is_gap = data['time'].astype(str).str.startswith('+')
+        winner = pd.to_numeric(data['position'], errors='coerce') == 1
+        return gap.where(is_gap, np.where(winner, 0, np.nan))
+    if column == 'fastestLapSpeed':
+        return parse_floats(data[column])
+    return parse_times(data[column])
+
+
+def add_parsed_columns(conn=None, db='f1.db'):
+    """
+    Adds the parsed millisecond/float columns from PARSED_COLUMNS to the DB,
+    fills them in bulk and indexes them so lap time queries sort on integers.
+    When given a connection nothing is committed, so it can run inside the load transaction.
+    :param conn: Optional open connection to the DB (default opens, commits and closes its own)
+    :param db: Path of the sqlite DB, used when no connection is given
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(db)
+    cur = conn.cursor()
+
+    for table, columns in PARSED_COLUMNS.items():
+        cur.execute(f'PRAGMA table_info({table});')
+        existing = [row[1] for row in cur.fetchall()]
+
+        for source, (target, col_type) in columns.items():
+            if target not in existing:
+                cur.execute(f'ALTER TABLE {table} ADD COLUMN {target} {col_type}')
+
+        source_cols = list(columns)
+        if table == 'results':
+            source_cols.append('position')
+        data = pd.read_sql_query(f'SELECT rowid AS row_id, {", ".join(source_cols)} FROM {table}', conn)
+
+        parsed = pd.DataFrame({target: parse_column(table, source, data)
+                               for source, (target, col_type) in columns.items()})
+        for target, col_type in columns.values():
+            if col_type == 'INTEGER':
+                parsed[target] = parsed[target].astype('Int64')
+        parsed = parsed.astype(object).where(parsed.notna(), None)
+        parsed['row_id'] = data['row_id'].astype(int)
+
+        targets = [target for target, col_type in columns.values()]
+        set_str = ', '.join(f'{target} = ?' for target in targets)
+        sql = f'UPDATE {table} SET {set_str} WHERE rowid = ?'
+        cur.executemany(sql, parsed[targets + ['row_id']].itertuples(index=False, name=None))
+
+        print(f'{len(parsed)} rows parsed in {table}.')
+
+    for index in PARSED_INDEXES:
+        cur.execute(index)
+
+    if own_conn:
+        conn.commit()
+        conn.close()
@@ -0,0 +1,106 @@
+import numpy as np
+
+import scripts
+
+SESSIONS = ['q1_ms', 'q2_ms', 'q3_ms']
+
+
+def qualifying_times(year=None):
+    """
+    Pulls the parsed qualifying times for every race (or a single season).
+    :param year: Optional season to filter on (default is every season)
+    :return: DataFrame with one row per driver per race
+    """
+    sql = "SELECT qualifying.raceId, races.year, races.round, qualifying.driverId, " \
+          "drivers.forename || ' ' || drivers.surname AS full_name, qualifying.constructorId, " \
+          "qualifying.position, qualifying.q1_ms, qualifying.q2_ms, qualifying.q3_ms FROM qualifying " \
+          "JOIN races USING(raceId) " \
+          "JOIN drivers USING(driverId) "
+    if year is not None:
+        sql += f"WHERE races.year = {int(year)} "
+    sql += "ORDER BY qualifying.raceId, qualifying.position"
+
+    data = scripts.db_pull(sql)
+    data[SESSIONS] = data[SESSIONS].astype(float)
+    data['best_ms'] = data[SESSIONS].min(axis=1)
+
+    return data
+
+
+def compare_sessions(pairs, suffix):
+    """
+    Compares two drivers per row in the last session both of them set a time in, q3 first.
+    Older formats without a Q2/Q3 fall back on Q1 (single session qualifying).
+    :param pairs: DataFrame with the session columns for both drivers, the other driver's suffixed
+    :param suffix: Suffix of the other driver's session columns (i.e. '_teammate')
+    :return: Arrays of the compared session (1-3), the driver's time and the other driver's time
+    """
+    session = np.full(len(pairs), np.nan)
+    mine = np.full(len(pairs), np.nan)
+    other = np.full(len(pairs), np.nan)
+    for i, col in reversed(list(enumerate(SESSIONS, start=1))):
+        both = pairs[col].notna() & pairs[f'{col}{suffix}'].notna() & np.isnan(session)
+        session[both] = i
+        mine[both] = pairs.loc[both, col]
+        other[both] = pairs.loc[both, f'{col}{suffix}']
+
+    return session, mine, other
+
+
+def gap_to_pole(year=None):
+    """
+    Gap of every driver to the pole-sitter in the last session both of them set a time in.
+    Drivers knocked out before Q3 can have a negative gap if they beat the pole-sitter's time in that session.
+    :param year: Optional season to filter on (default is every season)
+    :return: DataFrame with session, gap_ms and gap_pct (relative to the pole-sitter's time) columns added
+    """
+    data = qualifying_times(year)
+    pole = data.loc[data['position'] == 1, ['raceId'] + SESSIONS]
+    data = data.merge(pole, on='raceId', how='left', suffixes=('', '_pole'))
+
+    session, mine, pole_ms = compare_sessions(data, '_pole')
+    data['session'] = session
+    data['gap_ms'] = mine - pole_ms
+    data['gap_pct'] = data['gap_ms'] / pole_ms * 100
+
+    return data.drop(columns=[f'{col}_pole' for col in SESSIONS])
+
+
+def teammate_deltas(year=None):
+    """
+    Compares every driver with their teammate(s) in the last session both of them set a time in.
+    :param year: Optional season to filter on (default is every season)
+    :return: DataFrame with one row per driver per teammate per race, negative delta_ms means faster
+    """
+    data = qualifying_times(year)
+    cols = ['raceId', 'constructorId', 'driverId'] + SESSIONS
+    pairs = data.merge(data[cols], on=['raceId', 'constructorId'], suffixes=('', '_teammate'))
+    pairs = pairs[pairs['driverId'] != pairs['driverId_teammate']].reset_index(drop=True)
+
+    session, mine, teammate = compare_sessions(pairs, '_teammate')
+    pairs['session'] = session
+    pairs['delta_ms'] = mine - teammate
+    # Relative to the mean of both times in the compared session so each pair is symmetric
+    pairs['delta_pct'] = pairs['delta_ms'] / ((mine + teammate) / 2) * 100
+
+    return pairs.drop(columns=[f'{col}_teammate' for col in SESSIONS])
+
+
+def session_progression(year=None):
+    """
+    Shows how each driver progressed through Q1, Q2 and Q3 for every race.
+    :param year: Optional season to filter on (default is every season)
+    :return: DataFrame with gap to the fastest time of each session and lap time improvement between sessions
+    """
+    data = qualifying_times(year)
+
+    for col in SESSIONS:
+        session = col[:2]
+        data[f'{session}_gap_ms'] = data[col] - data.groupby('raceId')[col].transform('min')
+
+    data['q1_q2_ms'] = data['q2_ms'] - data['q1_ms']
+    data['q2_q3_ms'] = data['q3_ms'] - data['q2_ms']
+    data['last_session'] = (data[SESSIONS].notna().to_numpy() * np.arange(1, 4)).max(axis=1)
+
+    return data
+
@@ -6,14 +6,15 @@ import seaborn as sns
 import sqlite3
 
 
-def db_pull(sql):
+def db_pull(sql, db='f1.db'):
     """
     :param sql: SQL statement for desired data
+    :param db: Path of the sqlite DB (default is f1.db)
     :return: DataFrame of desired data
     """
     conn = None
     try:
-        conn = sqlite3.connect('f1.db')
+        conn = sqlite3.connect(db)
         cur = conn.cursor()
         data = pd.read_sql_query(sql, conn)
         cur.close()
@@ -26,6 +27,116 @@ def db_pull(sql):
     return data
 
 
+def query_schema(conn, sql):
+    """
+    Works out the dtype of every column a query returns from the declared column types,
+    so every chunk of a stream comes back with the same dtypes.
+    :param conn: Open connection to the DB
+    :param sql: SQL statement for desired data
+    :return: List of dtypes in column order, None for expressions without a declared type
+    """
+    cur = conn.cursor()
+    cur.execute('DROP VIEW IF EXISTS temp.stream_schema')
+    cur.execute(f"CREATE TEMP VIEW stream_schema AS {sql.strip().rstrip(';')}")
+    cur.execute('PRAGMA table_info(stream_schema);')
+    info = cur.fetchall()
+    cur.execute('DROP VIEW temp.stream_schema')
+    cur.close()
+
+    # Same order as sqlite's own type affinity rules
+    schema = list()
+    for row in info:
+        decl = row[2].upper()
+        if not decl:
+            schema.append(None)
+        elif 'INT' in decl:
+            schema.append('Int64')
+        elif any(i in decl for i in ('CHAR', 'CLOB', 'TEXT')):
+            schema.append('object')
+        elif any(i in decl for i in ('REAL', 'FLOA', 'DOUB')):
+            schema.append('float64')
+        else:
+            schema.append('object')
+
+    return schema
+
+
+def apply_schema(chunk, schema, coerce):
+    """
+    Casts a chunk to the given schema by column position, since a query can return the same name twice.
+    :param chunk: DataFrame to cast
+    :param schema: List of dtypes in column order
+    :param coerce: List of booleans in column order, True turns values that don't fit a numeric dtype
+        (i.e. \\N in an INTEGER column) into nulls, otherwise they raise
+    :return: Typed DataFrame
+    """
+    names = chunk.columns
+    chunk.columns = range(len(names))
+    for i, dtype in enumerate(schema):
+        if coerce[i]:
+            chunk[i] = pd.to_numeric(chunk[i], errors='coerce').astype(dtype)
+        else:
+            chunk[i] = chunk[i].astype(dtype)
+    chunk.columns = names
+
+    return chunk
+
+
+def db_stream(sql, chunksize=50000, dtype=None, records=False, db='f1.db'):
+    """
+    Generator version of db_pull for large result sets, only one chunk is held in memory at a time.
+    Every chunk has the same dtypes, taken from the declared column types (see query_schema).
+    Numeric columns without one (i.e. COUNT(*) or CASE expressions) are float64, others object.
+    :param sql: SQL statement for desired data
+    :param chunksize: Number of rows per chunk (default is 50000)
+    :param dtype: Optional dtype for every numeric column or dict of column -> dtype that overrides the schema
+        (default is None)
+    :param records: Yields numpy record arrays instead of DataFrames, nullable integers become floats (default is False)
+    :param db: Path of the sqlite DB (default is f1.db)
+    :return: Generator of DataFrames or numpy record arrays
+    """
+    conn = sqlite3.connect(db)
+    try:
+        declared = query_schema(conn, sql)
+        schema = None
+
+        for chunk in pd.read_sql_query(sql, conn, chunksize=chunksize):
+            if schema is None:
+                schema = list(declared)
+                if len(schema) != len(chunk.columns):
+                    schema = [None] * len(chunk.columns)
+                for i, col_type in enumerate(schema):
+                    if col_type is None:
+                        inferred = chunk.iloc[:, i].infer_objects().dtype
+                        numeric = pd.api.types.is_numeric_dtype(inferred)
+                        schema[i] = 'float64' if numeric else 'object'
+                # Only numeric columns are coerced, text that doesn't fit an override raises instead
+                coerce = [col_type in ('Int64', 'float64') for col_type in schema]
+
+                if isinstance(dtype, dict):
+                    schema = [dtype.get(col, col_type) for col, col_type in zip(chunk.columns, schema)]
+                elif dtype is not None:
+                    schema = [dtype if numeric else col_type for col_type, numeric in zip(schema, coerce)]
+
+            chunk = apply_schema(chunk, schema, coerce)
+
+            if records:
+                # Record arrays need unique field names, repeats get a suffix (driverId, driverId_1)
+                names, seen = list(), dict()
+                for col in chunk.columns:
+                    names.append(f'{col}_{seen[col]}' if col in seen else col)
+                    seen[col] = seen.get(col, 0) + 1
+                records_chunk = chunk.set_axis(names, axis=1)
+                records_chunk = records_chunk.astype({name: 'float64' for name, col_type in zip(names, schema)
+                                                      if col_type == 'Int64'})
+                yield records_chunk.to_records(index=False)
+            else:
+                yield chunk
+    finally:
+        conn.close()
+        print('Database connection closed.')
+
+
 def heatmap(data, row_labels, col_labels, ax=None, cbar_kw={}, cbarlabel="", **kwargs):
     """
     Create a heatmap from a numpy array and two lists of labels.
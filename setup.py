@@ -4,6 +4,9 @@ import os
 import sqlite3
 import csv
 
+import parsing
+import validation
+
 
 def setup():
     """
@@ -46,7 +49,7 @@ def create_tables_db():
     """
     Creates new tables in an sqlite DB to avoid the slow access time and
     difficult handling of data in multiple CSV files.
-    Throws an exception if the table exists.
+    Existing tables are left as they are, the load checks their columns against the CSV files.
     """
 
     con = sqlite3.connect('f1.db')
@@ -54,7 +57,7 @@ def create_tables_db():
 
     sql = (
         """
-        CREATE TABLE circuits (
+        CREATE TABLE IF NOT EXISTS circuits (
         circuitId INTEGER NOT NULL,
         circuitRef VARCHAR(255) DEFAULT "" NOT NULL,
         name VARCHAR(255) DEFAULT "" NOT NULL,
@@ -69,7 +72,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE constructor_results (
+        CREATE TABLE IF NOT EXISTS constructor_results (
         constructorResultsId INTEGER NOT NULL,
         raceId INTEGER DEFAULT 0 NOT NULL,
         constructorId INTEGER DEFAULT 0 NOT NULL,
@@ -79,7 +82,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE constructor_standings (
+        CREATE TABLE IF NOT EXISTS constructor_standings (
         constructorStandingsId INTEGER NOT NULL,
         raceId INTEGER DEFAULT 0 NOT NULL,
         constructorId INTEGER DEFAULT 0 NOT NULL,
@@ -91,7 +94,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE constructors (
+        CREATE TABLE IF NOT EXISTS constructors (
         constructorId INTEGER NOT NULL,
         constructorRef VARCHAR(255) DEFAULT "" NOT NULL,
         name VARCHAR(255) DEFAULT "" NOT NULL,
@@ -102,7 +105,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE driver_standings (
+        CREATE TABLE IF NOT EXISTS driver_standings (
         driverStandingsId INTEGER NOT NULL,
         raceId INTEGER DEFAULT 0 NOT NULL,
         driverId INTEGER DEFAULT 0 NOT NULL,
@@ -114,7 +117,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE drivers (
+        CREATE TABLE IF NOT EXISTS drivers (
         driverId INTEGER NOT NULL,
         driverRef VARCHAR(255) DEFAULT "" NOT NULL,
         number INTEGER,
@@ -129,7 +132,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE lap_times (
+        CREATE TABLE IF NOT EXISTS lap_times (
         raceId INTEGER NOT NULL,
         driverId INTEGER NOT NULL,
         lap INTEGER NOT NULL,
@@ -140,7 +143,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE pit_stops (
+        CREATE TABLE IF NOT EXISTS pit_stops (
         raceId INTEGER NOT NULL,
         driverId INTEGER NOT NULL,
         stop INTEGER NOT NULL,
@@ -152,7 +155,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE qualifying (
+        CREATE TABLE IF NOT EXISTS qualifying (
         qualifyId INTEGER NOT NULL,
         raceId INTEGER DEFAULT 0 NOT NULL,
         driverId INTEGER DEFAULT 0 NOT NULL,
@@ -166,7 +169,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE races (
+        CREATE TABLE IF NOT EXISTS races (
         raceId INTEGER NOT NULL,
         year INTEGER DEFAULT 0 NOT NULL,
         round INTEGER DEFAULT 0 NOT NULL,
@@ -180,7 +183,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE results (
+        CREATE TABLE IF NOT EXISTS results (
         resultId INTEGER NOT NULL,
         raceId INTEGER DEFAULT 0 NOT NULL,
         driverId INTEGER DEFAULT 0 NOT NULL,
@@ -203,7 +206,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE seasons (
+        CREATE TABLE IF NOT EXISTS seasons (
         year INTEGER DEFAULT 0 NOT NULL,
         url VARCHAR(255) DEFAULT "" NOT NULL,
         UNIQUE(url)
@@ -211,7 +214,7 @@ def create_tables_db():
         )
         """,
         """
-        CREATE TABLE status (
+        CREATE TABLE IF NOT EXISTS status (
         statusId INTEGER NOT NULL,
         status VARCHAR(255) DEFAULT "" NOT NULL,
         PRIMARY KEY(statusId)
@@ -220,15 +223,17 @@ def create_tables_db():
     )
 
     for i in sql:
-        try:
-            cur.execute(i)
-        except Exception as error:
-            print(error)
+        cur.execute(i)
+
+    con.close()
 
 
 def insert_from_csv():
     """
-    Inserts the data into the DB.
+    Replaces the data in the DB with the CSV files in a single transaction.
+    Headers and primary keys are checked per file and foreign keys across the whole DB before committing,
+    any problem rolls the load back and leaves the previous data in place.
+    The parsed time columns (see parsing.py) are filled in the same transaction.
     """
     conn = sqlite3.connect('f1.db')
 
@@ -236,66 +241,67 @@ def insert_from_csv():
 
     wd = os.getcwd()
     path = os.path.join(wd, 'files')
-    for file in os.listdir(path=path):
-        file_path = os.path.join(path, file)
-        data_to_insert = read_data_from_csv(file_path)
-
-        if len(data_to_insert) > 0:
+    problems = list()
+    try:
+        for file in sorted(os.listdir(path=path)):
+            file_path = os.path.join(path, file)
+            header, data_to_insert = read_data_from_csv(file_path)
             table = ''.join(file.split())[:-4]
 
-            col_names, col_nums = get_columns_from_db(cur, table)
-            values_str = '?, ' * col_nums
-            values_str = values_str[:-2]
+            columns, primary_key = validation.table_info(cur, table)
+            table_problems = validation.check_header(table, header, columns)
+            if not table_problems:
+                table_problems = validation.check_duplicate_keys(table, header, data_to_insert, primary_key)
+            if table_problems:
+                problems.extend(table_problems)
+                continue
+
+            cur.execute(f'DELETE FROM {table}')
+
+            if len(data_to_insert) > 0:
+                col_names = ', '.join(header)
+                values_str = ', '.join('?' * len(header))
+
+                sql = f'INSERT INTO {table}({col_names}) VALUES ({values_str})'
+
+                cur.executemany(sql, data_to_insert)
 
-            sql = f'INSERT INTO {table}({col_names}) VALUES ({values_str})'
+                l = len(data_to_insert)
 
-            cur.executemany(sql, data_to_insert)
-            conn.commit()
+                print(f'{l} rows inserted into {table}.')
+            else:
+                print(f'Nothing to insert into {table}.')
 
-            l = len(data_to_insert)
+        problems.extend(validation.validate_db(cur))
+        if problems:
+            raise validation.ValidationError('\n'.join(problems))
 
-            print(f'{l} rows inserted.')
-        else:
-            print('Nothing to insert.')
+        parsing.add_parsed_columns(conn)
 
-    conn.close()
+        conn.commit()
+    except Exception as error:
+        conn.rollback()
+        print(f'Load rolled back:\n{error}')
+        raise
+    finally:
+        conn.close()
 
 
 def read_data_from_csv(file_path):
     """
     Opens the required CSV and pulls the data
     :param file_path: path of the CSV file to process
-    :return: list with CSV content
+    :return: list with the CSV header and list with CSV content
     """
     with open(file_path, 'r', encoding='utf8') as csv_file:
         r = csv.reader(csv_file)
-        next(r)
+        header = next(r)
 
         data = list()
         for row in r:
             data.append(row)
 
-    return data
-
-
-def get_columns_from_db(sql_cursor, table_name):
-    """
-    Takes in the cursor and table name and returns the columns from the DB
-    :param sql_cursor: Cursor for the DB
-    :param table_name: Table to look up in DB
-    :return: Column names in comma separated form from given table in the DB
-    """
-    column_names = f'PRAGMA table_info({table_name});'
-    sql_cursor.execute(column_names)
-    column_names = sql_cursor.fetchall()
-
-    col_count = len(column_names)
-    col_names = list()
-
-    for name in column_names:
-        col_names.append(name[1])
-
-    return ', '.join(col_names), col_count
+    return header, data
 
 
 if __name__ == '__main__':
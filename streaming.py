@@ -0,0 +1,126 @@
+import csv
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import scripts
+
+
+def histogram_counts(chunks, column, edges):
+    """
+    Counts a stream of chunks into fixed bins, keeping track of values that fall outside of them.
+    :param chunks: Iterable of DataFrames or numpy record arrays (i.e. from scripts.db_stream)
+    :param column: Column to count
+    :param edges: Array of bin edges
+    :return: Counts per bin, count below the first edge and count above the last edge
+    """
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    under = 0
+    over = 0
+
+    for chunk in chunks:
+        values = pd.to_numeric(pd.Series(chunk[column]), errors='coerce').astype(float).to_numpy()
+        values = values[~np.isnan(values)]
+        under += int((values < edges[0]).sum())
+        over += int((values > edges[-1]).sum())
+        counts += np.histogram(values, bins=edges)[0]
+
+    return counts, under, over
+
+
+def stream_histogram(chunks, column, bins):
+    """
+    Builds a histogram from a stream of chunks without holding more than one chunk in memory.
+    Nulls are dropped, values outside of the bin edges raise a warning with how many were left out.
+    :param chunks: Iterable of DataFrames or numpy record arrays (i.e. from scripts.db_stream)
+    :param column: Column to count
+    :param bins: Array of bin edges, fixed up front since the full range isn't known while streaming
+    :return: Counts per bin and the bin edges
+    """
+    edges = np.asarray(bins, dtype=float)
+    counts, under, over = histogram_counts(chunks, column, edges)
+
+    if under or over:
+        warnings.warn(f'{column}: {under} values below and {over} values above the bin edges '
+                      f'were left out of the histogram.')
+
+    return counts, edges
+
+
+def stream_percentiles(chunks, column, q, bins):
+    """
+    Approximates percentiles from a stream of chunks by interpolating within histogram bins.
+    Accuracy is the bin width (i.e. 1 ms bins for lap times give exact-to-the-millisecond percentiles).
+    Values outside of the bin edges still count towards the total, so the percentiles that land inside
+    the bins are unbiased. Percentiles that land outside of them are NaN with a warning, widen the bins to get them.
+    :param chunks: Iterable of DataFrames or numpy record arrays (i.e. from scripts.db_stream)
+    :param column: Column to take the percentiles of
+    :param q: Percentile or list of percentiles between 0 and 100
+    :param bins: Array of bin edges
+    :return: Array of percentile values
+    """
+    edges = np.asarray(bins, dtype=float)
+    counts, under, over = histogram_counts(chunks, column, edges)
+    total = counts.sum() + under + over
+    q = np.atleast_1d(np.asarray(q, dtype=float)) / 100
+
+    if total == 0:
+        return np.full(len(q), np.nan)
+
+    cumulative = (under + np.concatenate(([0], np.cumsum(counts)))) / total
+    result = np.interp(q, cumulative, edges)
+
+    outside = (q < cumulative[0]) | (q > cumulative[-1])
+    if outside.any():
+        warnings.warn(f'{column}: {under} values below and {over} values above the bin edges, '
+                      f'percentiles {", ".join(str(i * 100) for i in q[outside])} fall outside of them.')
+        result[outside] = np.nan
+
+    return result
+
+
+def stream_groupby_sum(chunks, by, columns):
+    """
+    Running groupby-sum over a stream of chunks, only the partial sums are kept between chunks.
+    :param chunks: Iterable of DataFrames or numpy record arrays (i.e. from scripts.db_stream)
+    :param by: Column or list of columns to group by
+    :param columns: Column or list of columns to sum
+    :return: DataFrame of sums indexed by the group columns, with a row count per group
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    totals = None
+
+    for chunk in chunks:
+        chunk = pd.DataFrame(chunk)
+        part = chunk.groupby(by)[columns].sum()
+        part['count'] = chunk.groupby(by).size()
+        # add() upcasts to float, cast back so integer sums and counts stay integers
+        totals = part if totals is None else totals.add(part, fill_value=0).astype(part.dtypes.to_dict())
+
+    if totals is None:
+        return pd.DataFrame(columns=by + columns + ['count']).set_index(by)
+
+    return totals
+
+
+def export_query(sql, path, chunksize=50000, db='f1.db'):
+    """
+    Writes the result of a query to a CSV file chunk by chunk, output starts with the first chunk.
+    Every chunk uses the schema from scripts.db_stream so a column is written the same way throughout.
+    :param sql: SQL statement for desired data
+    :param path: CSV file to write
+    :param chunksize: Number of rows per chunk (default is 50000)
+    :param db: Path of the sqlite DB (default is f1.db)
+    :return: Number of rows written
+    """
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf8') as csv_file:
+        for chunk in scripts.db_stream(sql, chunksize=chunksize, db=db):
+            chunk.to_csv(csv_file, header=rows == 0, index=False, quoting=csv.QUOTE_NONNUMERIC)
+            rows += len(chunk)
+
+    print(f'{rows} rows exported to {path}.')
+
+    return rows
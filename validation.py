@@ -0,0 +1,141 @@
+import pandas as pd
+
+import parsing
+
+# (table, column, referenced table, referenced column)
+FOREIGN_KEYS = (
+    ('results', 'raceId', 'races', 'raceId'),
+    ('results', 'driverId', 'drivers', 'driverId'),
+    ('results', 'constructorId', 'constructors', 'constructorId'),
+    ('results', 'statusId', 'status', 'statusId'),
+    ('qualifying', 'raceId', 'races', 'raceId'),
+    ('qualifying', 'driverId', 'drivers', 'driverId'),
+    ('qualifying', 'constructorId', 'constructors', 'constructorId'),
+    ('lap_times', 'raceId', 'races', 'raceId'),
+    ('lap_times', 'driverId', 'drivers', 'driverId'),
+    ('pit_stops', 'raceId', 'races', 'raceId'),
+    ('pit_stops', 'driverId', 'drivers', 'driverId'),
+    ('driver_standings', 'raceId', 'races', 'raceId'),
+    ('driver_standings', 'driverId', 'drivers', 'driverId'),
+    ('constructor_standings', 'raceId', 'races', 'raceId'),
+    ('constructor_standings', 'constructorId', 'constructors', 'constructorId'),
+    ('constructor_results', 'raceId', 'races', 'raceId'),
+    ('constructor_results', 'constructorId', 'constructors', 'constructorId'),
+    ('races', 'circuitId', 'circuits', 'circuitId'),
+    ('races', 'year', 'seasons', 'year'),
+)
+
+# Natural keys that should be unique but aren't enforced by the schema
+UNIQUE_KEYS = {
+    'races': ('year', 'round'),
+    'qualifying': ('raceId', 'driverId'),
+    'driver_standings': ('raceId', 'driverId'),
+    'constructor_standings': ('raceId', 'constructorId'),
+    'constructor_results': ('raceId', 'constructorId'),
+}
+
+
+class ValidationError(Exception):
+    """
+    Raised when the data doesn't match the schema, the load is rolled back.
+    """
+
+
+def table_info(sql_cursor, table_name):
+    """
+    :param sql_cursor: Cursor for the DB
+    :param table_name: Table to look up in DB
+    :return: Column names loaded from CSV (parsed columns excluded) and primary key columns of the table
+    """
+    sql_cursor.execute(f'PRAGMA table_info({table_name});')
+    info = sql_cursor.fetchall()
+
+    parsed = [target for target, col_type in parsing.PARSED_COLUMNS.get(table_name, {}).values()]
+    columns = [row[1] for row in info if row[1] not in parsed]
+    primary_key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5] > 0]
+
+    return columns, primary_key
+
+
+def check_header(table_name, header, columns):
+    """
+    Checks the CSV header has exactly the columns of the table, in any order.
+    :return: List of problems found
+    """
+    if not columns:
+        return [f'{table_name}: no such table in the schema.']
+
+    problems = []
+    missing = [col for col in columns if col not in header]
+    unknown = [col for col in header if col not in columns]
+    if missing:
+        problems.append(f'{table_name}: CSV is missing columns {", ".join(missing)}.')
+    if unknown:
+        problems.append(f'{table_name}: CSV has unknown columns {", ".join(unknown)}.')
+    if len(set(header)) != len(header):
+        problems.append(f'{table_name}: CSV header has duplicate column names.')
+
+    return problems
+
+
+def check_duplicate_keys(table_name, header, data, primary_key):
+    """
+    Checks for repeated primary keys in the CSV rows before they are inserted.
+    :return: List of problems found
+    """
+    if not data:
+        return []
+
+    frame = pd.DataFrame(data, columns=header)
+    duplicated = frame.duplicated(subset=primary_key, keep=False)
+    if not duplicated.any():
+        return []
+
+    keys = frame.loc[duplicated, primary_key].drop_duplicates().head(5)
+    examples = ', '.join(str(tuple(row)) for row in keys.itertuples(index=False, name=None))
+
+    return [f'{table_name}: {duplicated.sum()} rows share a primary key ({", ".join(primary_key)}), i.e. {examples}.']
+
+
+def check_unique_keys(sql_cursor):
+    """
+    Checks the natural keys in UNIQUE_KEYS across whole tables.
+    :return: List of problems found
+    """
+    problems = []
+    for table, key in UNIQUE_KEYS.items():
+        key_str = ', '.join(key)
+        sql_cursor.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM {table} '
+                           f'GROUP BY {key_str} HAVING COUNT(*) > 1)')
+        count = sql_cursor.fetchone()[0]
+        if count:
+            problems.append(f'{table}: {count} duplicate ({key_str}) keys.')
+
+    return problems
+
+
+def check_references(sql_cursor):
+    """
+    Checks every foreign key in FOREIGN_KEYS points at an existing row.
+    :return: List of problems found
+    """
+    problems = []
+    for table, column, ref_table, ref_column in FOREIGN_KEYS:
+        sql_cursor.execute(f'SELECT COUNT(*), MIN({table}.{column}) FROM {table} '
+                           f'LEFT JOIN {ref_table} ON {table}.{column} = {ref_table}.{ref_column} '
+                           f'WHERE {ref_table}.{ref_column} IS NULL')
+        count, example = sql_cursor.fetchone()
+        if count:
+            problems.append(f'{table}.{column}: {count} rows reference a missing {ref_table}.{ref_column}, '
+                            f'i.e. {example}.')
+
+    return problems
+
+
+def validate_db(sql_cursor):
+    """
+    Runs the whole-table checks, meant to be called inside the load transaction before committing.
+    :param sql_cursor: Cursor for the DB
+    :return: List of problems found
+    """
+    return check_unique_keys(sql_cursor) + check_references(sql_cursor)